@@ -1,29 +1,61 @@
 import os
+
+# Thread config harus di-set sebelum import TensorFlow / NumPy
+TF_INTRA_OP_THREADS = int(os.environ.get('TF_INTRA', '4'))
+TF_INTER_OP_THREADS = int(os.environ.get('TF_INTER', '1'))
+os.environ.setdefault('OMP_NUM_THREADS', str(TF_INTRA_OP_THREADS))
+os.environ.setdefault('TF_ENABLE_ONEDNN_OPTS', '1')
+
 import numpy as np
+import psutil
 import tensorflow as tf
+from cachetools import LRUCache
 from flask import Flask, render_template, request, jsonify, send_from_directory
 from PIL import Image
 import io
 import base64
+import hashlib
 import json
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from preprocessing import (
+    IMG_SIZE, PREVIEW_SIZE, DRAFT_SIZE, CLASS_NAMES,
+    MODEL_PATH, TFLITE_MODEL_PATHS, preprocess_for_inference,
+)
 
 app = Flask(__name__, static_folder='static')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'brain-tumor-secret-key-2024')
+# Cache hasil prediction berdasarkan hash isi file (upload ulang scan yang sama)
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('PREDICTION_CACHE_SIZE', '256'))
+# Cache hit tetap dihitung di statistics
+app.config['PREDICTION_CACHE_COUNT_STATS'] = os.environ.get('PREDICTION_CACHE_COUNT_STATS', '1') == '1'
 
-IMG_SIZE = (224, 224)
-CLASS_NAMES = ["glioma", "meningioma", "notumor", "pituitary"]
+# fp32 = Keras model, fp16 / int8 = TFLite model
+MODEL_VARIANT = os.environ.get('MODEL_VARIANT', 'fp16').lower()
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+# Thread TFLite = jumlah physical core (hyperthread tidak membantu GEMM)
+TFLITE_NUM_THREADS = int(os.environ.get('TFLITE_THREADS', psutil.cpu_count(logical=False) or os.cpu_count()))
+# Optional: path shared object delegate eksternal (misalnya XNNPACK build sendiri)
+TFLITE_DELEGATE_PATH = os.environ.get('TFLITE_DELEGATE_PATH')
+# Opsional: saat startup bandingkan dengan builtin kernels tanpa XNNPACK (interpreter
+# kedua + beberapa forward pass tambahan per process, jadi default mati)
+TFLITE_DELEGATE_CHECK = os.environ.get('TFLITE_DELEGATE_CHECK', '0') == '1'
 
-MODEL_PATH = os.path.join(
-    PROJECT_ROOT,
-    "outputs",
-    "model",
-    "densenet121_model.keras"
-)
+# Decode + resize + normalize di dalam graph TF: '1', '0', atau 'auto' (aktif kalau ada GPU)
+TF_PREPROCESS = os.environ.get('TF_PREPROCESS', 'auto')
+# Format yang didukung tf.io.decode_image, format lain tetap lewat PIL
+TF_PREPROCESS_FORMATS = {'JPEG', 'PNG'}
+
+# Micro-batching untuk request yang datang bersamaan
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '8'))
+MAX_BATCH_WAIT_MS = float(os.environ.get('MAX_BATCH_WAIT_MS', '10'))
+# Batch size yang di-compile XLA: 1, 2, 4, ... sampai MAX_BATCH_SIZE
+BATCH_BUCKETS = sorted({min(2 ** i, MAX_BATCH_SIZE) for i in range(MAX_BATCH_SIZE.bit_length() + 1)})
 
 CLASS_DESCRIPTIONS = {
     "glioma": {
@@ -56,67 +88,314 @@ CLASS_DESCRIPTIONS = {
     }
 }
 
+# Scaffold per class untuk all_probabilities, dibuat sekali saat import
+_ALL_PROB_TEMPLATE = tuple((class_name, CLASS_DESCRIPTIONS[class_name]) for class_name in CLASS_NAMES)
+
 # Statistics tracking
 prediction_stats = {
     "total_predictions": 0,
     "predictions_today": 0,
     "last_prediction_time": None,
-    "class_distribution": {class_name: 0 for class_name in CLASS_NAMES}
+    "class_distribution": Counter({class_name: 0 for class_name in CLASS_NAMES})
 }
+_stats_lock = threading.Lock()
+_last_prediction_date = None
+
+class TFLiteModel:
+    """Wrapper tf.lite.Interpreter dengan interface predict() seperti Keras model"""
+
+    def __init__(self, model_path, default_delegates=True):
+        self.model_path = model_path
+        if TFLITE_DELEGATE_PATH:
+            self.delegate = os.path.basename(TFLITE_DELEGATE_PATH)
+            self.interpreter = tf.lite.Interpreter(
+                model_path=model_path,
+                num_threads=TFLITE_NUM_THREADS,
+                experimental_delegates=[tf.lite.experimental.load_delegate(TFLITE_DELEGATE_PATH)]
+            )
+        elif default_delegates:
+            # Default op resolver memasang XNNPACK jika build TFLite mendukungnya,
+            # bisa dicek dengan check_default_delegate() saat startup (TFLITE_DELEGATE_CHECK=1)
+            self.delegate = 'default'
+            self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=TFLITE_NUM_THREADS)
+        else:
+            # Builtin kernels tanpa XNNPACK, untuk pembanding
+            self.delegate = 'none'
+            self.interpreter = tf.lite.Interpreter(
+                model_path=model_path,
+                num_threads=TFLITE_NUM_THREADS,
+                experimental_op_resolver_type=tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+            )
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        # Interpreter tidak thread-safe
+        self._lock = threading.Lock()
+
+    def _quantize(self, x):
+        if self.input_details['dtype'] != np.int8:
+            return x.astype(self.input_details['dtype'])
+        scale, zero_point = self.input_details['quantization']
+        x = np.round(x / scale + zero_point)
+        return np.clip(x, -128, 127).astype(np.int8)
+
+    def _dequantize(self, y):
+        if self.output_details['dtype'] != np.int8:
+            return y.astype(np.float32)
+        scale, zero_point = self.output_details['quantization']
+        return (y.astype(np.float32) - zero_point) * scale
+
+    def predict(self, img_array, verbose=0):
+        # Input tensor TFLite fixed batch size 1
+        outputs = []
+        with self._lock:
+            for sample in img_array:
+                self.interpreter.set_tensor(self.input_details['index'], self._quantize(sample[np.newaxis, ...]))
+                self.interpreter.invoke()
+                outputs.append(self.interpreter.get_tensor(self.output_details['index'])[0])
+        return self._dequantize(np.stack(outputs))
+
+
+def benchmark_ms(forward, batch, runs=3):
+    """Rata-rata latency forward pass dalam ms (setelah warm up)"""
+    forward(batch)
+    start = time.perf_counter()
+    for _ in range(runs):
+        forward(batch)
+    return (time.perf_counter() - start) / runs * 1000
+
+def check_default_delegate(tflite_model, batch):
+    """Tebak dari latency apakah XNNPACK terpasang, dibanding builtin kernels tanpa XNNPACK"""
+    latency_ms = benchmark_ms(tflite_model.predict, batch)
+    baseline_ms = benchmark_ms(TFLiteModel(tflite_model.model_path, default_delegates=False).predict, batch)
+    # Heuristik timing saja: XNNPACK biasanya jelas lebih cepat, selisih kecil berarti
+    # kemungkinan delegate tidak terpasang
+    applied = latency_ms < 0.8 * baseline_ms
+    return applied, latency_ms, baseline_ms
+
+def load_inference_model(variant=MODEL_VARIANT):
+    """Load TFLite model sesuai MODEL_VARIANT, fallback ke Keras model"""
+    tflite_path = TFLITE_MODEL_PATHS.get(variant)
+    if variant != 'fp32' and tflite_path is None:
+        print(f"Unknown MODEL_VARIANT '{variant}', using fp32")
+    elif tflite_path is not None and not os.path.exists(tflite_path):
+        print(f"{tflite_path} not found, run convert_tflite.py. Using fp32")
+    elif tflite_path is not None:
+        try:
+            start = time.perf_counter()
+            tflite_model = TFLiteModel(tflite_path)
+            print(f"Loaded DenseNet121 TFLite {variant.upper()} in {time.perf_counter() - start:.2f}s")
+            return tflite_model
+        except Exception as e:
+            print(f"Error loading TFLite model, falling back to Keras model: {e}")
+
+    start = time.perf_counter()
+    keras_model = tf.keras.models.load_model(MODEL_PATH)
+    print(f"Loaded DenseNet121 in {time.perf_counter() - start:.2f}s, params={keras_model.count_params():,}")
+    # Summary lambat dan memenuhi log, hanya kalau diminta
+    if os.environ.get('MODEL_SUMMARY'):
+        keras_model.summary()
+    return keras_model
+
+def build_forward(model):
+    """Buat fungsi forward pass: numpy batch -> numpy predictions"""
+    if isinstance(model, TFLiteModel):
+        return model.predict
+
+    def make_infer(jit_compile):
+        # Signature tetap (batch dinamis) supaya tidak ada retracing per request
+        @tf.function(
+            jit_compile=jit_compile,
+            input_signature=[tf.TensorSpec((None, *IMG_SIZE, 3), tf.float32)]
+        )
+        def _infer(batch):
+            return model(batch, training=False)
+        return _infer
+
+    def warm_buckets(_infer):
+        # XLA compile ulang untuk setiap batch size baru, jadi batch di-pad ke salah satu
+        # BATCH_BUCKETS dan semua bucket di-compile sekarang, bukan di tengah request
+        for bucket in BATCH_BUCKETS:
+            _infer(tf.zeros((bucket, *IMG_SIZE, 3), dtype=tf.float32))
+
+    # XLA fuse BatchNorm/ReLU ke conv epilogue. Semua bucket di-compile di sini supaya
+    # kegagalan XLA di bucket mana pun ketahuan saat startup, bukan saat request
+    _infer = make_infer(jit_compile=True)
+    try:
+        warm_buckets(_infer)
+    except Exception as e:
+        print(f"XLA compilation failed, falling back to jit_compile=False: {e}")
+        _infer = make_infer(jit_compile=False)
+        warm_buckets(_infer)
+
+    def forward(batch):
+        n = len(batch)
+        bucket = next(b for b in BATCH_BUCKETS if b >= n)
+        if bucket > n:
+            batch = np.concatenate([batch, np.zeros((bucket - n, *batch.shape[1:]), dtype=batch.dtype)])
+        return _infer(tf.constant(batch)).numpy()[:n]
+
+    return forward
+
+def build_bytes_forward(model):
+    """Buat fungsi forward pass dari raw bytes gambar (preprocessing di device yang sama dengan model)"""
+    @tf.function(input_signature=[tf.TensorSpec((), tf.string)])
+    def _infer_bytes(raw):
+        img = tf.io.decode_image(raw, channels=3, expand_animations=False)
+        img = tf.image.resize(img, IMG_SIZE, method='bilinear', antialias=True)
+        img = img / 255.0
+        return model(img[tf.newaxis, ...], training=False)
+
+    return lambda raw: _infer_bytes(tf.constant(raw)).numpy()
+
+class InferenceWorker:
+    """Background thread yang menggabungkan request bersamaan menjadi satu batch"""
+
+    def __init__(self, forward, max_batch=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS):
+        self.forward = forward
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Thread di-start saat request pertama
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='inference-worker', daemon=True)
+                self._thread.start()
+
+    def drain_queue(self):
+        """Ambil sampai max_batch item, tunggu paling lama max_wait setelah item pertama"""
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self.drain_queue()
+            try:
+                batch = np.concatenate([img_array for img_array, _, _ in items], axis=0)
+                predictions = self.forward(batch)
+                for (_, _, result_holder), prediction in zip(items, predictions):
+                    result_holder['predictions'] = prediction[np.newaxis, ...]
+            except Exception as e:
+                for _, _, result_holder in items:
+                    result_holder['error'] = e
+            for _, event, _ in items:
+                event.set()
+
+    def predict(self, img_array):
+        self._ensure_started()
+        event = threading.Event()
+        result_holder = {}
+        self._queue.put((img_array, event, result_holder))
+        event.wait()
+        if 'error' in result_holder:
+            raise result_holder['error']
+        return result_holder['predictions']
+
+model = None
+inference_worker = None
+infer_bytes = None
+
+def init_inference():
+    """Load model lalu build + warm up forward pass, sekali per process"""
+    global model, inference_worker, infer_bytes
+
+    # Batasi thread pool TF supaya request bersamaan tidak oversubscribe CPU.
+    # Harus sebelum op TF pertama di process ini
+    tf.config.threading.set_intra_op_parallelism_threads(TF_INTRA_OP_THREADS)
+    tf.config.threading.set_inter_op_parallelism_threads(TF_INTER_OP_THREADS)
+
+    print("Loading model...")
+    try:
+        model = load_inference_model()
+    except Exception as e:
+        print(f"Error loading model: {e}")
+        model = None
+        return
+
+    if TF_PREPROCESS == 'auto':
+        tf_preprocess = bool(tf.config.list_physical_devices('GPU'))
+    else:
+        tf_preprocess = TF_PREPROCESS == '1'
+    if tf_preprocess and not isinstance(model, TFLiteModel):
+        infer_bytes = build_bytes_forward(model)
+        infer_bytes(tf.io.encode_jpeg(tf.zeros((*IMG_SIZE, 3), dtype=tf.uint8)).numpy())
+        print("TF preprocessing enabled for JPEG/PNG uploads")
+
+    forward = build_forward(model)
+    # Call pertama melakukan tracing graph, jadi warm up saat startup
+    dummy_batch = np.zeros((1, *IMG_SIZE, 3), dtype=np.float32)
+    forward(dummy_batch)
+    # Interpreter TFLite fixed batch 1, worker hanya menambah latency batch window
+    if not isinstance(model, TFLiteModel):
+        inference_worker = InferenceWorker(forward)
 
-print("Loading model...")
-try:
-    model = tf.keras.models.load_model(MODEL_PATH)
-    print(f"Model loaded successfully!")
-    print(f"Model summary:")
-    model.summary()
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+    # Benchmark singkat supaya regresi latency terlihat di log startup
+    if isinstance(model, TFLiteModel) and model.delegate == 'default' and TFLITE_DELEGATE_CHECK:
+        applied, latency_ms, baseline_ms = check_default_delegate(model, dummy_batch)
+        status = 'likely applied' if applied else 'likely NOT applied'
+        print(f"TFLite benchmark: {latency_ms:.1f} ms/image vs {baseline_ms:.1f} ms/image builtin kernels without XNNPACK "
+              f"(XNNPACK {status}, inferred from timing, threads={TFLITE_NUM_THREADS})")
+    elif isinstance(model, TFLiteModel):
+        latency_ms = benchmark_ms(forward, dummy_batch)
+        print(f"TFLite benchmark: {latency_ms:.1f} ms/image (delegate={model.delegate}, threads={TFLITE_NUM_THREADS})")
+    else:
+        latency_ms = benchmark_ms(forward, dummy_batch)
+        print(f"Keras benchmark: {latency_ms:.1f} ms/image (intra_op_threads={TF_INTRA_OP_THREADS})")
+
+# Di bawah gunicorn (DEFER_MODEL_INIT=1 dari gunicorn_conf.py) TF tidak boleh jalan di
+# master process: thread pool dan CUDA context TF tidak ikut ter-fork. Setiap worker
+# memanggil init_inference() sendiri di post_fork
+if os.environ.get('DEFER_MODEL_INIT') != '1':
+    init_inference()
 
 def allowed_file(filename):
     allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
-def preprocess_for_inference(image):
-    # Convert ke RGB jika perlu
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
-    
-    # Resize ke 224x224
-    image = image.resize(IMG_SIZE)
-    
-    # Convert ke numpy array
-    img_array = np.array(image, dtype=np.float32)
-    
-    # Normalisasi 0-255 -> 0-1
-    img_array = img_array / 255.0
-    
-    # Expand dimensions untuk batch size
-    img_array = np.expand_dims(img_array, axis=0)
-    
-    return img_array
-
 
 def update_statistics(predicted_class):
     """Update prediction statistics"""
+    global _last_prediction_date
     now = datetime.now()
-    prediction_stats["total_predictions"] += 1
+    today = now.date()
 
-    if prediction_stats["last_prediction_time"]:
-        last_date = prediction_stats["last_prediction_time"].date()
-        if now.date() > last_date:
-            prediction_stats["predictions_today"] = 1
-        else:
+    with _stats_lock:
+        prediction_stats["total_predictions"] += 1
+
+        if today == _last_prediction_date:
             prediction_stats["predictions_today"] += 1
-    else:
-        prediction_stats["predictions_today"] = 1
-    
-    prediction_stats["last_prediction_time"] = now
-    prediction_stats["class_distribution"][predicted_class] += 1
+        else:
+            prediction_stats["predictions_today"] = 1
+            _last_prediction_date = today
 
-def predict_image(image):
-    """Predict class dari gambar"""
+        prediction_stats["last_prediction_time"] = now
+        prediction_stats["class_distribution"][predicted_class] += 1
+
+def get_statistics_snapshot():
+    """Copy prediction_stats yang konsisten untuk di-serialize"""
+    with _stats_lock:
+        return {**prediction_stats, "class_distribution": dict(prediction_stats["class_distribution"])}
+
+def _softmax(x):
+    # NumPy softmax, untuk 4 class jauh lebih murah daripada tf.nn.softmax (op dispatch + EagerTensor)
+    e = np.exp(x - x.max())
+    return e / e.sum()
+
+def predict_image(image, raw=None):
+    """Predict class dari gambar, raw = bytes file asli (untuk TF preprocessing)"""
     try:
         if model is None:
             print("Using dummy model")
@@ -125,31 +404,39 @@ def predict_image(image):
             predicted_class = CLASS_NAMES[predicted_idx]
             confidence = float(probs[predicted_idx])
         else:
-            img_array = preprocess_for_inference(image)
-            predictions = model.predict(img_array, verbose=0)
+            if infer_bytes is not None and raw is not None and image.format in TF_PREPROCESS_FORMATS:
+                predictions = infer_bytes(raw)
+            else:
+                img_array = preprocess_for_inference(image)
+                if inference_worker is not None:
+                    predictions = inference_worker.predict(img_array)
+                else:
+                    predictions = model.predict(img_array)
             
+            # argmax dari logits sama dengan argmax dari softmax
+            predicted_idx = int(np.argmax(predictions[0]))
             if len(predictions.shape) == 2:
-                probs = tf.nn.softmax(predictions[0]).numpy()
+                probs = _softmax(predictions[0].astype(np.float32))
             else:
                 probs = predictions[0]
 
-            predicted_idx = np.argmax(probs)
             predicted_class = CLASS_NAMES[predicted_idx]
             confidence = float(probs[predicted_idx])
         
         # Update statistics
         update_statistics(predicted_class)
         
-        # Buat dictionary hasil
+        # Buat dictionary hasil, tolist() convert semua probability ke float sekaligus
+        probs_list = probs.tolist()
         result = {
             'predicted_class': predicted_class,
             'confidence': confidence,
             'all_probabilities': {
                 class_name: {
-                    'probability': float(probs[i]),
-                    'percentage': float(probs[i] * 100),
-                    'info': CLASS_DESCRIPTIONS[class_name]
-                } for i, class_name in enumerate(CLASS_NAMES)
+                    'probability': p,
+                    'percentage': p * 100.0,
+                    'info': info
+                } for (class_name, info), p in zip(_ALL_PROB_TEMPLATE, probs_list)
             },
             'class_info': CLASS_DESCRIPTIONS[predicted_class]
         }
@@ -160,11 +447,40 @@ def predict_image(image):
         print(f"Prediction error: {e}")
         return None, str(e)
 
+# BytesIO per thread, dipakai ulang untuk setiap preview
+_b64_local = threading.local()
+
 def image_to_base64(image):
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG", optimize=True)
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    return f"data:image/png;base64,{img_str}"
+    buffered = getattr(_b64_local, 'buf', None)
+    if buffered is None:
+        buffered = _b64_local.buf = io.BytesIO()
+    buffered.seek(0)
+    buffered.truncate()
+    # PNG hanya untuk gambar dengan alpha, selain itu JPEG (jauh lebih cepat di-encode)
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image.save(buffered, format="PNG")
+        mime_type = "image/png"
+    else:
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(buffered, format="JPEG", quality=80)
+        mime_type = "image/jpeg"
+    # getbuffer() menghindari copy bytes dari getvalue(), view harus di-release sebelum truncate berikutnya
+    with buffered.getbuffer() as view:
+        img_str = base64.b64encode(view).decode('ascii')
+    return f"data:{mime_type};base64,{img_str}"
+
+def make_preview(image):
+    """Thumbnail + base64 encode untuk preview di frontend"""
+    image.thumbnail(PREVIEW_SIZE, Image.Resampling.BILINEAR)
+    return image_to_base64(image)
+
+# PREDICTION_CACHE_SIZE=0 mematikan cache
+_PRED_CACHE = LRUCache(maxsize=app.config['PREDICTION_CACHE_SIZE']) if app.config['PREDICTION_CACHE_SIZE'] > 0 else None
+_pred_cache_lock = threading.Lock()
+
+# Encode preview paralel dengan inference (PIL dan TF sama-sama melepas GIL)
+_io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='preview')
 
 # APP
 @app.route('/')
@@ -173,7 +489,7 @@ def home():
                          class_names=CLASS_NAMES,
                          class_descriptions=CLASS_DESCRIPTIONS,
                          img_size=IMG_SIZE,
-                         stats=prediction_stats)
+                         stats=get_statistics_snapshot())
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -191,34 +507,55 @@ def predict():
         if not allowed_file(file.filename):
             return jsonify({'error': 'File type not allowed. Please use PNG, JPG, JPEG, GIF, BMP, or TIFF'}), 400
         
-        # Buka gambar
-        try:
-            image = Image.open(file.stream)
-            # Verify it's a valid image
-            image.verify()
-            file.stream.seek(0)  
-            image = Image.open(file.stream)
-        except Exception as e:
-            return jsonify({'error': f'Invalid image file: {str(e)}'}), 400
+        # Satu kali read dari stream upload, semua langkah berikutnya (hash, PIL, TF) pakai raw
+        raw = file.stream.read()
+        if not raw:
+            return jsonify({'error': 'Uploaded file is empty'}), 400
         
-        # Predict
-        result, error = predict_image(image)
+        cached_result = None
+        if _PRED_CACHE is not None:
+            # Cache berisi scan + diagnosis pasien, jadi key harus collision-resistant
+            cache_key = hashlib.blake2b(raw, digest_size=32).digest()
+            with _pred_cache_lock:
+                cached_result = _PRED_CACHE.get(cache_key)
         
-        if error:
-            return jsonify({'error': error}), 500
-        
-        # Convert image ke base64 untuk preview
-        preview_size = (400, 400)
-        preview_image = image.copy()
-        preview_image.thumbnail(preview_size, Image.Resampling.LANCZOS)
-        img_base64 = image_to_base64(preview_image)
+        if cached_result is not None:
+            result = dict(cached_result)
+            if app.config['PREDICTION_CACHE_COUNT_STATS']:
+                update_statistics(result['predicted_class'])
+        else:
+            # Buka gambar
+            try:
+                # BytesIO(raw) berbagi buffer dengan raw, tanpa copy
+                image = Image.open(io.BytesIO(raw))
+                original_size = image.size
+                # DCT-domain downscale untuk JPEG (no-op untuk format lain)
+                image.draft('RGB', DRAFT_SIZE)
+                # Decode sekali di sini, file corrupt langsung ditolak
+                image.load()
+            except Exception as e:
+                return jsonify({'error': f'Invalid image file: {str(e)}'}), 400
+            
+            # Convert image ke base64 untuk preview, berjalan paralel dengan predict.
+            # Pakai copy karena thumbnail() mengubah gambar in-place
+            preview_future = _io_pool.submit(make_preview, image.copy())
+            
+            # Predict
+            result, error = predict_image(image, raw=raw)
+            
+            if error:
+                return jsonify({'error': error}), 500
+            
+            result['image_preview'] = preview_future.result()
+            result['original_size'] = original_size
+            if _PRED_CACHE is not None:
+                with _pred_cache_lock:
+                    _PRED_CACHE[cache_key] = dict(result)
         
         # Tambahkan info tambahan ke result
-        result['image_preview'] = img_base64
-        result['original_size'] = image.size
         result['filename'] = file.filename
         result['timestamp'] = datetime.now().isoformat()
-        result['stats'] = prediction_stats
+        result['stats'] = get_statistics_snapshot()
         
         return jsonify(result)
         
@@ -228,7 +565,7 @@ def predict():
 
 @app.route('/api/statistics')
 def get_statistics():
-    return jsonify(prediction_stats)
+    return jsonify(get_statistics_snapshot())
 
 @app.route('/api/classes')
 def get_classes():
@@ -293,4 +630,5 @@ if __name__ == '__main__':
     print("="*60 + "\n")
     
     # Run app
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server, untuk production pakai run_server.sh (gunicorn)
+    app.run(host='0.0.0.0', port=5000)
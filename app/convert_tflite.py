@@ -0,0 +1,146 @@
+"""Convert DenseNet121 Keras model ke TFLite FlatBuffer (FP16 / INT8).
+
+Jalankan sekali sebelum start app:
+    python convert_tflite.py                # fp16 + int8
+    python convert_tflite.py --variant fp16
+
+Setiap hasil convert dicek dulu di data/Testing terhadap Keras model, dan tidak
+ditulis kalau top-1 agreement di bawah --min-agreement (exit code 1).
+"""
+import argparse
+import os
+import random
+import sys
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+from preprocessing import (
+    CLASS_NAMES, PROJECT_ROOT, MODEL_PATH, TFLITE_MODEL_PATHS, preprocess_for_inference,
+)
+
+NUM_VALIDATION_IMAGES = 200
+# Minimal top-1 agreement dengan Keras model sebelum .tflite ditulis
+MIN_AGREEMENT = 0.98
+
+TESTING_DIR = os.path.join(PROJECT_ROOT, "data", "Testing")
+
+
+def load_images(data_dir, num_images, seed):
+    """Ambil sample MRI yang seimbang dari setiap class, return (images, labels)"""
+    rng = random.Random(seed)
+    per_class = max(1, num_images // len(CLASS_NAMES))
+
+    samples = []
+    for label, class_name in enumerate(CLASS_NAMES):
+        class_dir = os.path.join(data_dir, class_name)
+        files = sorted(os.listdir(class_dir))
+        samples.extend((os.path.join(class_dir, f), label) for f in rng.sample(files, min(per_class, len(files))))
+
+    images, labels = [], []
+    for path, label in samples:
+        with Image.open(path) as image:
+            # Buffer preprocess_for_inference dipakai ulang, jadi di-copy
+            images.append(preprocess_for_inference(image).copy())
+        labels.append(label)
+    return images, np.array(labels)
+
+
+def tflite_predict(tflite_model, images):
+    """Jalankan model TFLite per image (input fixed batch 1), return index class"""
+    interpreter = tf.lite.Interpreter(model_content=tflite_model, num_threads=os.cpu_count())
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+
+    preds = []
+    for img_array in images:
+        # Kedua variant memakai input/output float32
+        interpreter.set_tensor(input_details['index'], img_array)
+        interpreter.invoke()
+        preds.append(np.argmax(interpreter.get_tensor(output_details['index'])[0]))
+    return np.array(preds)
+
+
+def validate(tflite_model, variant, images, labels, keras_preds, min_agreement):
+    preds = tflite_predict(tflite_model, images)
+    agreement = np.mean(preds == keras_preds)
+    accuracy = np.mean(preds == labels)
+    print(f"{variant.upper()}: top-1 agreement with Keras {agreement:.1%}, "
+          f"accuracy {accuracy:.1%} on {len(labels)} test images")
+    return agreement >= min_agreement
+
+
+def convert_fp16(model):
+    # Weights disimpan sebagai float16, input/output tetap float32
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+def convert_int8(model):
+    # Dynamic range: weights int8, activations di-quantize per tensor saat runtime.
+    # Full-integer (activations int8 dari representative dataset) tidak dipakai karena
+    # error kuantisasi menumpuk di DenseNet121 dan model memprediksi notumor untuk semua input
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    return converter.convert()
+
+
+def save_model(tflite_model, variant):
+    path = TFLITE_MODEL_PATHS[variant]
+    with open(path, 'wb') as f:
+        f.write(tflite_model)
+
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"Saved {variant.upper()} model to {path} ({size_mb:.1f} MB)")
+
+
+def reject_model(variant, min_agreement):
+    path = TFLITE_MODEL_PATHS[variant]
+    print(f"ERROR: {variant.upper()} model rejected, top-1 agreement below {min_agreement:.0%}; "
+          f"{path} not written", file=sys.stderr)
+    # Hapus hasil convert lama supaya app fallback ke Keras model, bukan memakai file yang tidak tervalidasi
+    if os.path.exists(path):
+        os.remove(path)
+        print(f"Removed stale {path}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--variant', choices=['fp16', 'int8', 'all'], default='all')
+    parser.add_argument('--min-agreement', type=float, default=MIN_AGREEMENT)
+    parser.add_argument('--validation-images', type=int, default=NUM_VALIDATION_IMAGES)
+    args = parser.parse_args()
+
+    print(f"Loading model from {MODEL_PATH}...")
+    model = tf.keras.models.load_model(MODEL_PATH)
+
+    print(f"Loading {args.validation_images} validation images from {TESTING_DIR}...")
+    images, labels = load_images(TESTING_DIR, args.validation_images, seed=0)
+    keras_preds = np.argmax(model.predict(np.concatenate(images), batch_size=16, verbose=0), axis=1)
+    print(f"Keras: accuracy {np.mean(keras_preds == labels):.1%} on {len(labels)} test images")
+
+    converted = {}
+    if args.variant in ('fp16', 'all'):
+        print("Converting to FP16 TFLite...")
+        converted['fp16'] = convert_fp16(model)
+
+    if args.variant in ('int8', 'all'):
+        print("Converting to INT8 TFLite...")
+        converted['int8'] = convert_int8(model)
+
+    failed = False
+    for variant, tflite_model in converted.items():
+        if validate(tflite_model, variant, images, labels, keras_preds, args.min_agreement):
+            save_model(tflite_model, variant)
+        else:
+            reject_model(variant, args.min_agreement)
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Konfigurasi gunicorn untuk production.
+
+    gunicorn -c gunicorn_conf.py app:app
+"""
+import os
+
+import psutil
+
+# Master process hanya import library, model di-load di setiap worker setelah fork.
+# Harus di-set sebelum app.py di-import oleh preload_app
+os.environ['DEFER_MODEL_INIT'] = '1'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Import TensorFlow / Flask sekali di master, code pages di-share ke semua worker
+preload_app = True
+
+CPU_CORES = psutil.cpu_count(logical=False) or os.cpu_count()
+
+# Default 4 core per worker, sama dengan default TF_INTRA
+workers = int(os.environ.get('GUNICORN_WORKERS', max(1, CPU_CORES // 4)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '2'))
+
+# Core dibagi rata ke semua worker supaya total compute thread TF / TFLite tidak
+# melebihi jumlah core. Dibaca app.py saat import, nilai eksplisit di env tetap menang
+threads_per_worker = str(max(1, CPU_CORES // workers))
+os.environ.setdefault('TF_INTRA', threads_per_worker)
+os.environ.setdefault('TFLITE_THREADS', threads_per_worker)
+os.environ.setdefault('OMP_NUM_THREADS', threads_per_worker)
+
+# post_fork (load model + XLA compile semua batch bucket) berjalan sebelum worker
+# mengirim heartbeat pertama, jadi timeout harus lebih lama dari itu
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '300'))
+
+
+def post_fork(server, worker):
+    from app import init_inference
+    init_inference()
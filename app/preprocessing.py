@@ -0,0 +1,66 @@
+"""Konstanta model dan preprocessing PIL yang dipakai app.py dan convert_tflite.py.
+
+Sengaja tidak import TensorFlow, supaya validasi di convert_tflite.py
+memakai preprocessing yang persis sama dengan inference di app.py.
+"""
+import os
+import threading
+import numpy as np
+from PIL import Image
+
+IMG_SIZE = (224, 224)
+PREVIEW_SIZE = (400, 400)
+# JPEG di-decode langsung ke resolusi terkecil yang masih cukup untuk model dan preview.
+# 2x IMG_SIZE supaya bilinear downscale ke IMG_SIZE tetap halus
+DRAFT_SIZE = (max(IMG_SIZE[0] * 2, PREVIEW_SIZE[0]), max(IMG_SIZE[1] * 2, PREVIEW_SIZE[1]))
+CLASS_NAMES = ["glioma", "meningioma", "notumor", "pituitary"]
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+
+MODEL_DIR = os.path.join(PROJECT_ROOT, "outputs", "model")
+
+MODEL_PATH = os.path.join(
+    MODEL_DIR,
+    "densenet121_model.keras"
+)
+
+# Hasil dari convert_tflite.py
+TFLITE_MODEL_PATHS = {
+    "fp16": os.path.join(MODEL_DIR, "densenet121_model_fp16.tflite"),
+    "int8": os.path.join(MODEL_DIR, "densenet121_model_int8.tflite"),
+}
+
+# Scratch buffer per thread untuk hasil preprocessing
+_preproc_local = threading.local()
+
+def _get_preproc_buffer():
+    buf = getattr(_preproc_local, 'buf', None)
+    if buf is None:
+        buf = np.empty((1, *IMG_SIZE, 3), dtype=np.float32)
+        _preproc_local.buf = buf
+    return buf
+
+def preprocess_for_inference(image):
+    """PIL image -> array (1, 224, 224, 3) float32 di 0-1.
+
+    Array yang dikembalikan adalah buffer per thread dan ditimpa pada panggilan
+    berikutnya, copy dulu kalau hasilnya perlu disimpan.
+    """
+    # JPEG yang belum di-decode langsung di-downscale oleh libjpeg
+    # (no-op untuk format lain atau gambar yang sudah di-load)
+    image.draft('RGB', DRAFT_SIZE)
+
+    # Convert ke RGB jika perlu
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Resize ke 224x224
+    image = image.resize(IMG_SIZE, Image.Resampling.BILINEAR)
+
+    # Convert uint8 -> float32 dan normalisasi 0-255 -> 0-1 dalam satu pass,
+    # langsung ke buffer (1, 224, 224, 3) yang sudah dialokasikan
+    img_array = _get_preproc_buffer()
+    np.multiply(np.asarray(image, dtype=np.uint8), np.float32(1.0 / 255.0), out=img_array[0])
+
+    return img_array
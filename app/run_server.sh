@@ -0,0 +1,4 @@
+#!/bin/sh
+# Start app dengan gunicorn (production). Untuk development: python app.py
+cd "$(dirname "$0")" || exit 1
+exec gunicorn -c gunicorn_conf.py app:app